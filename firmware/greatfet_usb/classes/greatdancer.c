@@ -340,6 +340,26 @@ static int greatdancer_verb_get_status(struct command_transaction *trans)
 }
 
 
+/**
+ * Queries the GreatDancer for all of its status registers at once, so the host
+ * can check for every kind of pending event with a single request, rather than
+ * issuing one get_status request per register.
+ *
+ *	Always transmits five 4-byte words back to the host, in the same order as
+ *	the get_status indices: USBSTS, ENDPTSETUPSTAT, ENDPTCOMPLETE, ENDPTSTATUS,
+ *	and ENDPTNAK.
+ */
+static int greatdancer_verb_get_all_status(struct command_transaction *trans)
+{
+	for (int index = GET_USBSTS; index <= GET_ENDPTNAK; ++index) {
+		uint32_t status = get_status_register(index, &usb_peripherals[1]);
+		comms_response_add_uint32_t(trans, status);
+	}
+
+	return 0;
+}
+
+
 /**
  * Reads a setup packet from the GreatDancer port and relays it to the host.
  * The index parameter specifies which endpoint we should be reading from.
@@ -401,6 +421,42 @@ static void store_transfer_count_callback(void * const user_data, unsigned int t
 }
 
 
+/**
+ * Primes the USB controller to recieve data on a particular OUT endpoint, but
+ * does not wait for a transfer to complete.
+ *
+ * @param endpoint_number The number of the endpoint to be primed.
+ */
+static void greatdancer_start_nonblocking_read(int endpoint_number)
+{
+		uint_fast8_t address;
+		usb_endpoint_t *target_endpoint;
+
+		// Figure out the endpoint we're reading setup data from...
+		address = usb_endpoint_address(USB_TRANSFER_DIRECTION_OUT, endpoint_number);
+		target_endpoint = usb_endpoint_from_address(address, &usb_peripherals[1]);
+
+		// ... and start a nonblocking transfer.
+		usb_transfer_schedule(target_endpoint, &endpoint_buffer[endpoint_number], sizeof(packet_buffer),
+				store_transfer_count_callback, &total_received_data[endpoint_number]);
+}
+
+
+/**
+ * Primes each OUT endpoint in a bitmask to recieve data.
+ *
+ * @param endpoint_mask A bitmask of the endpoints to be primed; bit N selects endpoint N.
+ */
+static void greatdancer_start_nonblocking_reads(uint16_t endpoint_mask)
+{
+		for (int endpoint_number = 0; endpoint_number < NUM_USB1_ENDPOINTS; ++endpoint_number) {
+			if (endpoint_mask & (1 << endpoint_number)) {
+				greatdancer_start_nonblocking_read(endpoint_number);
+			}
+		}
+}
+
+
 /**
  * Primes the USB controller to recieve data on a particular endpoint, but
  * does not wait for a transfer to complete. The transfer's status can be
@@ -410,22 +466,38 @@ static void store_transfer_count_callback(void * const user_data, unsigned int t
  */
 static int greatdancer_verb_start_nonblocking_read(struct command_transaction *trans)
 {
-		uint_fast8_t address;
-		usb_endpoint_t *target_endpoint;
-
 		int endpoint_number = comms_argument_parse_uint8_t(trans);
 
 		if (!comms_transaction_okay(trans)) {
 			return EBADMSG;
 		}
 
-		// Figure out the endpoint we're reading setup data from...
-		address = usb_endpoint_address(USB_TRANSFER_DIRECTION_OUT, endpoint_number);
-		target_endpoint = usb_endpoint_from_address(address, &usb_peripherals[1]);
+		greatdancer_start_nonblocking_read(endpoint_number);
+		return 0;
+}
 
-		// ... and start a nonblocking transfer.
-		usb_transfer_schedule(target_endpoint, &endpoint_buffer[endpoint_number], sizeof(packet_buffer),
-				store_transfer_count_callback, &total_received_data[endpoint_number]);
+
+/**
+ * Primes several OUT endpoints to recieve data at once; equivalent to issuing
+ * start_nonblocking_read for each endpoint, but with a single request.
+ *
+ * Accepts a bitmask of the endpoints to be primed; bit N selects endpoint N.
+ */
+static int greatdancer_verb_start_nonblocking_reads(struct command_transaction *trans)
+{
+		uint16_t endpoint_mask = comms_argument_parse_uint16_t(trans);
+
+		if (!comms_transaction_okay(trans)) {
+			return EBADMSG;
+		}
+
+		// Reject any attempt to prime endpoints we don't have.
+		if (endpoint_mask >> NUM_USB1_ENDPOINTS) {
+			pr_error("greatdancer: trying to prime impossible endpoints (mask %x)!\n", endpoint_mask);
+			return EINVAL;
+		}
+
+		greatdancer_start_nonblocking_reads(endpoint_mask);
 		return 0;
 }
 
@@ -571,18 +643,14 @@ static int greatdancer_verb_stall_endpoint(struct command_transaction *trans)
 
 
 /**
- * Should be called whenever a transfer is complete; cleans up any transfer
- * descriptors associated with that transfer.
+ * Cleans up any transfer descriptors associated with a completed transfer.
+ *
+ * @param endpoint_address The address of the endpoint whose transfer has completed.
  */
-static int greatdancer_verb_clean_up_transfer(struct command_transaction *trans)
+static void greatdancer_clean_up_transfer(uint_fast8_t endpoint_address)
 {
-		uint_fast8_t endpoint_address = comms_argument_parse_uint8_t(trans);
 		int endpoint_number = endpoint_address & 0x7F;
 
-		if (!comms_transaction_okay(trans)) {
-			return EBADMSG;
-		}
-
 		// Figure out the endpoint we're reading setup data from...
 		usb_endpoint_t* const target_endpoint = usb_endpoint_from_address(endpoint_address, &usb_peripherals[1]);
 
@@ -595,6 +663,108 @@ static int greatdancer_verb_clean_up_transfer(struct command_transaction *trans)
 
 		// Clean up any transfers that are complete on the given endpoint.
 		usb_queue_transfer_complete(target_endpoint);
+}
+
+
+/**
+ * Cleans up the transfers on each endpoint in a bitmask.
+ *
+ * @param completion_mask A bitmask laid out like the ENDPTCOMPLETE register.
+ */
+static void greatdancer_clean_up_transfers(uint32_t completion_mask)
+{
+		for (int endpoint_number = 0; endpoint_number < NUM_USB1_ENDPOINTS; ++endpoint_number) {
+			if (completion_mask & USB1_ENDPTCOMPLETE_ERCE(1 << endpoint_number)) {
+				greatdancer_clean_up_transfer(usb_endpoint_address(USB_TRANSFER_DIRECTION_OUT, endpoint_number));
+			}
+			if (completion_mask & USB1_ENDPTCOMPLETE_ETCE(1 << endpoint_number)) {
+				greatdancer_clean_up_transfer(usb_endpoint_address(USB_TRANSFER_DIRECTION_IN, endpoint_number));
+			}
+		}
+}
+
+
+/**
+ * Should be called whenever a transfer is complete; cleans up any transfer
+ * descriptors associated with that transfer.
+ */
+static int greatdancer_verb_clean_up_transfer(struct command_transaction *trans)
+{
+		uint_fast8_t endpoint_address = comms_argument_parse_uint8_t(trans);
+
+		if (!comms_transaction_okay(trans)) {
+			return EBADMSG;
+		}
+
+		greatdancer_clean_up_transfer(endpoint_address);
+		return 0;
+}
+
+
+/**
+ * Cleans up the transfers on several endpoints at once; equivalent to issuing
+ * clean_up_transfer for each endpoint, but with a single request.
+ *
+ * Accepts a bitmask laid out like the ENDPTCOMPLETE register -- OUT endpoints in
+ * the low halfword, IN endpoints in the high halfword -- so the host can pass back
+ * the completion status it read, as-is.
+ */
+static int greatdancer_verb_clean_up_transfers(struct command_transaction *trans)
+{
+		uint32_t completion_mask = comms_argument_parse_uint32_t(trans);
+
+		if (!comms_transaction_okay(trans)) {
+			return EBADMSG;
+		}
+
+		greatdancer_clean_up_transfers(completion_mask);
+		return 0;
+}
+
+
+/**
+ * Services every completed transfer in a single request: cleans up each transfer
+ * the controller reports as complete, and then re-primes any OUT endpoint in the
+ * auto-prime mask that isn't already waiting for data. This replaces the
+ * get_status / clean_up_transfers / get_status / start_nonblocking_reads sequence
+ * a host would otherwise issue for each batch of events.
+ *
+ * OUT endpoints that complete a transfer here are never re-primed, as their data
+ * still waits in their buffer for finish_nonblocking_read; the host re-primes them
+ * once it's handled that data.
+ *
+ * Returns the ENDPTCOMPLETE value from before cleanup, and the ENDPTSTATUS value
+ * afterwards -- including any endpoints primed on the host's behalf.
+ */
+static int greatdancer_verb_service_transfers(struct command_transaction *trans)
+{
+		uint32_t auto_prime_mask = comms_argument_parse_uint32_t(trans);
+		uint32_t completion_status, readiness;
+		uint16_t endpoints_to_prime;
+
+		if (!comms_transaction_okay(trans)) {
+			return EBADMSG;
+		}
+
+		// Reject any attempt to prime endpoints we don't have.
+		if (auto_prime_mask >> NUM_USB1_ENDPOINTS) {
+			pr_error("greatdancer: trying to auto-prime impossible endpoints (mask %x)!\n", auto_prime_mask);
+			return EINVAL;
+		}
+
+		// Clean up everything that's finished...
+		completion_status = usb_get_endpoint_complete(&usb_peripherals[1]);
+		greatdancer_clean_up_transfers(completion_status);
+
+		// ... and re-prime any requested OUT endpoints that aren't currently primed -- skipping
+		// those that just completed, whose data the host hasn't yet read out of their buffers.
+		// Like ENDPTCOMPLETE, ENDPTSTATUS keeps its OUT endpoints in the low halfword.
+		readiness = usb_get_endpoint_ready(&usb_peripherals[1]);
+		endpoints_to_prime = auto_prime_mask & ~readiness & ~(completion_status & 0xFFFF);
+		greatdancer_start_nonblocking_reads(endpoints_to_prime);
+
+		comms_response_add_uint32_t(trans, completion_status);
+		comms_response_add_uint32_t(trans, readiness | endpoints_to_prime);
 		return 0;
 }
 
@@ -614,7 +784,7 @@ static void greatdancer_check_for_asynchronous_events()
 	// Check for SET_ADDRESS events on EP0.
 
 	// If we have an event on EP0::out, check to see if it's a setup event.
-	if( endptsetupstat && endptsetupstat_bit ) {
+	if( endptsetupstat & endptsetupstat_bit ) {
 		usb_endpoint_t* const endpoint = &usb1_endpoint_control_out;
 
 		usb_copy_setup(&endpoint->setup, usb_queue_head(endpoint->address, endpoint->device)->setup);
@@ -731,6 +901,20 @@ static struct comms_verb _verbs[] = {
 		{  .name = "get_nonblocking_data_length", .handler = greatdancer_verb_get_nonblocking_data_length, .in_signature = "<B",
 		   .out_signature = "<I", .in_param_names = "endpoint_number", .out_param_names = "length",
 		   .doc = "Returns the amount of data read after a given non-blocking read.\n" },
+		{  .name = "get_all_status", .handler = greatdancer_verb_get_all_status, .in_signature = "",
+		   .out_signature = "<IIIII",
+		   .out_param_names = "usbsts, endptsetupstat, endptcomplete, endptstatus, endptnak",
+		   .doc = "Reads all of the device's USB status registers at once." },
+		{  .name = "start_nonblocking_reads", .handler = greatdancer_verb_start_nonblocking_reads, .in_signature = "<H",
+		   .out_signature = "", .in_param_names = "endpoint_mask",
+		   .doc = "Begins listening for data on each OUT endpoint in the given bitmask.\n" },
+		{  .name = "clean_up_transfers", .handler = greatdancer_verb_clean_up_transfers, .in_signature = "<I",
+		   .out_signature = "", .in_param_names = "completion_mask",
+		   .doc = "Cleans up any complete transfers on each endpoint in the given ENDPTCOMPLETE-style bitmask." },
+		{  .name = "service_transfers", .handler = greatdancer_verb_service_transfers, .in_signature = "<I",
+		   .out_signature = "<II", .in_param_names = "auto_prime_mask",
+		   .out_param_names = "completion_status, readiness",
+		   .doc = "Cleans up all complete transfers, and re-primes each unprimed OUT endpoint in the given bitmask." },
 
 		/* Sentinel. */
 		{}
@@ -1,11 +1,27 @@
-from __future__ import print_function
-# Alias objects to make them easier to import.
-from .greatfet import GreatFET
-GreatFET = GreatFET  # pyflakes
+import os
+import functools
 
+__all__ = ['GreatFET', 'greatfet_assets_directory', 'find_greatfet_asset']
+
+
+def __getattr__(name):
+    """ Lazily provides our top-level aliases, so importing greatfet doesn't pull in
+    pyusb and every board class until a board is actually needed. """
+
+    # Alias objects to make them easier to import.
+    if name == 'GreatFET':
+        from .greatfet import GreatFET
+
+        # Store the alias, so we only take this path on first use.
+        globals()['GreatFET'] = GreatFET
+        return GreatFET
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+@functools.lru_cache(maxsize=None)
 def greatfet_assets_directory():
     """ Provide a quick function that helps us get at our assets directory. """
-    import os
 
     # Find the path to the module, and then find its assets folder.
     module_path = os.path.dirname(__file__)
@@ -14,7 +30,6 @@ def greatfet_assets_directory():
 
 def find_greatfet_asset(filename):
     """ Returns the path to a given GreatFET asset, if it exists, or None if the GreatFET asset isn't provided."""
-    import os
 
     asset_path = os.path.join(greatfet_assets_directory(), filename)
 
@@ -6,10 +6,21 @@
 Module containing the core definitions for a GreatFET board.
 """
 
+import errno
+import functools
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import usb
+import usb.backend.libusb1
+
 from .peripherals.led import LED
 from .peripherals.gpio import GPIO
+from . import errors
 
 from pygreat.board import GreatBoard
+from pygreat.errors import DeviceNotFoundError
 
 
 # Default device identifiers.
@@ -23,6 +34,85 @@ LIBUSB_PIPE_ERROR = 32
 # Total seconds we should wait after a reset before reconnecting.
 RECONNECT_DELAY = 3
 
+# How long we initially wait between attempts to reconnect after a reset, in seconds;
+# and the longest we'll let that wait grow to.
+RECONNECT_INITIAL_POLL_INTERVAL = 0.1
+RECONNECT_MAX_POLL_INTERVAL = 0.5
+
+# Errors we expect to see while a board is still re-enumerating after a reset -- including
+# permission errors, which we'll see until udev has finished setting up the new device;
+# any others won't go away by waiting, and are raised immediately.
+RECONNECT_TRANSIENT_ERRNOS = (errno.EIO, errno.ENODEV, errno.ENOENT, errno.EPIPE, errno.EBUSY,
+        errno.EACCES, errno.EPERM)
+
+# Board classes, indexed by each of the board IDs they handle; populated as each
+# GreatFETBoard subclass is defined. A given ID can be handled by more than one class;
+# e.g. GreatFET Ones running modern and legacy firmware share a board ID.
+_BOARD_CLASSES_BY_ID = {}
+
+# How long, in seconds, the results of a USB enumeration may be reused; and those results,
+# indexed by the identifiers used to find them. Enumeration is slow on some platforms,
+# and tools often autodetect several times in quick succession.
+DEVICE_LIST_CACHE_LIFETIME = 2.0
+_DEVICE_LIST_CACHE = {}
+
+# The most devices we'll probe at once in autodetect_all.
+MAX_CONCURRENT_PROBES = 8
+
+
+def _pad_serial_number(identifiers):
+    """ Zero pads any serial number in a set of device identifiers to 32 characters,
+    to match those provided by the USB descriptors; as pygreat does when it connects. """
+
+    if identifiers.get('serial_number') is not None and len(identifiers['serial_number']) < 32:
+        identifiers['serial_number'] = identifiers['serial_number'].zfill(32)
+
+
+@functools.lru_cache(maxsize=None)
+def get_usb_backend():
+    """ Returns the pyusb backend to be used for all of our device searches.
+
+    Resolving pyusb's default backend walks each of its backends on every usb.core.find()
+    call; we resolve the libusb1 backend once, and then reuse it. Returns None -- which
+    tells pyusb to perform its normal search -- if libusb1 isn't available.
+    """
+    return usb.backend.libusb1.get_backend()
+
+
+class _LazyLEDMap(Mapping):
+    """ Read-only mapping from LED numbers to LED objects; each LED object is only
+    created when it's first used. """
+
+    def __init__(self, board, led_count):
+        """
+        Args:
+            board -- The board that owns the LEDs.
+            led_count -- The number of LEDs present on the board; these are one-indexed.
+        """
+        self._board = board
+        self._led_count = led_count
+        self._leds = {}
+
+
+    def __getitem__(self, led_number):
+        if led_number not in self._leds:
+
+            # Match the behavior of a plain dictionary for LEDs we don't have.
+            if led_number not in range(1, self._led_count + 1):
+                raise KeyError(led_number)
+
+            self._leds[led_number] = LED(self._board, led_number)
+
+        return self._leds[led_number]
+
+
+    def __iter__(self):
+        return iter(range(1, self._led_count + 1))
+
+
+    def __len__(self):
+        return self._led_count
+
 
 class GreatFETBoard(GreatBoard):
     """
@@ -40,6 +130,405 @@ class GreatFETBoard(GreatBoard):
     """
     GPIO_MAPPINGS = {}
 
+    # The longest we'll wait for the board to come back after a reset, in seconds.
+    RECONNECT_DELAY = RECONNECT_DELAY
+
+
+    def __init_subclass__(cls, **kwargs):
+        """ Registers each new board class under the board IDs it handles. """
+        super(GreatFETBoard, cls).__init_subclass__(**kwargs)
+
+        for board_id in cls.HANDLED_BOARD_IDS:
+            _BOARD_CLASSES_BY_ID.setdefault(board_id, []).append(cls)
+
+
+    @classmethod
+    def autodetect(cls, **device_identifiers):
+        """
+        Attempts to create a new instance of the GreatFETBoard subclass
+        most applicable to the given device. For example, if the attached
+        board is a GreatFET One, this will automatically create a
+        GreatFETOne object.
+
+        The bus is enumerated up front, and each subclass's probe is then pinned to
+        the bus and address of the device found there; so every probe opens that same
+        physical device, rather than searching for a matching one. A successful probe
+        is returned directly, rather than being torn down and re-opened; and once any
+        probe has read the device's board ID, only the classes registered for that ID
+        are tried.
+
+        Accepts the same arguments as pyusb's usb.find() method, allowing narrowing
+        to a more specific GreatFET by e.g. serial number.
+
+        Throws a DeviceNotFoundError if no device is avaiable.
+        """
+
+        # Pin all of our probes to a single physical device, so each subclass's
+        # usb.find() matches that device directly.
+        identifiers_for_each_device = cls._identifiers_for_each_device(device_identifiers)
+
+        if not identifiers_for_each_device:
+            raise DeviceNotFoundError()
+
+        board = cls._autodetect_device(identifiers_for_each_device[0])
+
+        # If we couldn't find a board, raise an error.
+        if board is None:
+            raise DeviceNotFoundError()
+
+        return board
+
+
+    @classmethod
+    def autodetect_all(cls, **device_identifiers):
+        """
+        Attempts to create a new instance of the most applicable GreatFETBoard
+        subclass for each attached device; see autodetect.
+
+        The bus is enumerated up front, and each device's probes are pinned to the
+        bus and address it was found at, rather than each subclass searching for every
+        device it accepts. As each probe spends most of its time waiting on USB
+        round-trips, the devices found are probed concurrently; each probe opens only
+        its own device.
+
+        Returns a list of board objects, which is empty if no device is available.
+        """
+
+        identifiers_for_each_device = cls._identifiers_for_each_device(device_identifiers)
+
+        # Don't bother spinning up any threads if there's at most one device to probe.
+        if len(identifiers_for_each_device) <= 1:
+            boards = [cls._autodetect_device(identifiers) for identifiers in identifiers_for_each_device]
+        else:
+            workers = min(len(identifiers_for_each_device), MAX_CONCURRENT_PROBES)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                boards = list(executor.map(cls._autodetect_device, identifiers_for_each_device))
+
+        return [board for board in boards if board is not None]
+
+
+    @classmethod
+    def _autodetect_device(cls, identifiers):
+        """ Creates an instance of the GreatFETBoard subclass that accepts a single device.
+
+        Args:
+            identifiers -- Identifiers that match only the device to be probed.
+
+        Returns the new board object, with its APIs initialized; or None if no subclass
+        accepts the device.
+        """
+
+        # Iterate over each subclass of GreatFETBoard until we find a board
+        # that accepts the given device.
+        candidates = cls.__subclasses__()
+        while candidates:
+            subclass = candidates.pop(0)
+            board, board_id = subclass._probe(**identifiers)
+
+            # Ensure the board we return has fully populated comms APIs.
+            if board is not None:
+                board.initialize_apis()
+                return board
+
+            # If the probe got far enough to read the board's ID, there's no sense in
+            # trying classes that don't handle that ID; narrow down to those that do.
+            if board_id is not None:
+                handlers = _BOARD_CLASSES_BY_ID.get(board_id, [])
+                candidates = [candidate for candidate in candidates if candidate in handlers]
+
+        return None
+
+
+    @classmethod
+    def _enumerate_devices(cls, device_identifiers):
+        """ Returns a list of all connected USB devices that match the given identifiers.
+
+        Args:
+            device_identifiers -- Any user-specified identifiers; these override
+                the board's default vendor and product IDs.
+        """
+
+        # By default, accept any device with the default vendor/product IDs.
+        identifiers = {
+            'idVendor': cls.BOARD_VENDOR_ID,
+            'idProduct': cls.BOARD_PRODUCT_ID,
+        }
+        identifiers.update(device_identifiers)
+
+        # For convenience, allow serial_number=None to be equivalent to not
+        # providing a serial number.
+        if 'serial_number' in identifiers and identifiers['serial_number'] is None:
+            del identifiers['serial_number']
+
+        _pad_serial_number(identifiers)
+        identifiers['find_all'] = True
+
+        # If we've recently performed this same enumeration, reuse its results.
+        cache_key = tuple(sorted(identifiers.items()))
+        timestamp, devices = _DEVICE_LIST_CACHE.get(cache_key, (None, None))
+
+        if timestamp is not None and (time.monotonic() - timestamp) < DEVICE_LIST_CACHE_LIFETIME:
+            return list(devices)
+
+        try:
+            devices = list(usb.core.find(backend=get_usb_backend(), **identifiers))
+        except usb.core.USBError as e:
+            # On some platforms, providing identifiers that don't match with any
+            # real device produces a USBError/Pipe Error; treat that as "no devices".
+            if e.errno == LIBUSB_PIPE_ERROR:
+                devices = []
+            else:
+                raise
+
+        # Don't hold on to an empty result: anyone enumerating again soon is likely waiting
+        # for a device to appear, and should see it as soon as it does.
+        if devices:
+            _DEVICE_LIST_CACHE[cache_key] = (time.monotonic(), devices)
+
+        return list(devices)
+
+
+    @staticmethod
+    def _forget_enumerated_devices():
+        """ Discards any cached enumeration results; e.g. as boards re-enumerate after a reset,
+        and so no longer have the addresses we found them at. """
+        _DEVICE_LIST_CACHE.clear()
+
+
+    @classmethod
+    def _identifiers_for_each_device(cls, device_identifiers):
+        """ Returns a list containing, for each device that matches the provided
+        identifiers, a set of identifiers that match only that device.
+        """
+
+        identifiers_for_each_device = []
+
+        for device in cls._enumerate_devices(device_identifiers):
+
+            # The bus and address uniquely identify a device, so every usb.find() made with
+            # these identifiers will grab the same device we've found here.
+            identifiers = device_identifiers.copy()
+            _pad_serial_number(identifiers)
+            identifiers['bus'] = device.bus
+            identifiers['address'] = device.address
+            identifiers_for_each_device.append(identifiers)
+
+            # We only needed this device for enumeration; release anything pyusb holds
+            # for it, so the board objects we create can claim it cleanly.
+            usb.util.dispose_resources(device)
+
+        return identifiers_for_each_device
+
+
+    @classmethod
+    def _probe(cls, **device_identifiers):
+        """ Attempts to create an instance of this board class for the given device.
+
+        Returns a 2-tuple of (board, board_id). If this class accepts the device, board
+        is the new board object; otherwise it's None, and board_id holds the device's
+        board ID if it was read before the device was rejected.
+        """
+
+        # Construct the board in two steps, so we can still see what it learned
+        # about the device if its initialization rejects it.
+        board = cls.__new__(cls)
+
+        try:
+            board.__init__(**device_identifiers)
+            return board, None
+        except (DeviceNotFoundError, errors.DeviceNotFoundError):
+            pass
+        except usb.core.USBError as e:
+
+            # A pipe error here likely means the device didn't support a start-up
+            # command, and STALLED; some backends report the same failure with no errno.
+            # We'll interpret either as "we don't accept this device", as pygreat does.
+            if e.errno not in (LIBUSB_PIPE_ERROR, None):
+                raise
+
+        board_info = getattr(board, '_board_info', {})
+        return None, board_info.get('board_id')
+
+
+    def __init__(self, **device_identifiers):
+        """ Instantiates a new connection to a GreatFET device; see GreatBoard.__init__. """
+
+        # Start off with no memoized board information; see _memoized_board_info.
+        self._board_info = {}
+
+        # Keep track of how we found this board, so we can find it again after a reset.
+        self._device_identifiers = device_identifiers.copy()
+
+        super(GreatFETBoard, self).__init__(**device_identifiers)
+
+
+    def _memoized_board_info(self, key, read_function, *args):
+        """ Returns a piece of board information, querying the board only on first use.
+
+        Information like the board ID can't change while we're connected, so there's
+        no need to issue a fresh control transfer every time it's requested.
+
+        Args:
+            key -- The key under which the information is memoized.
+            read_function -- The function used to read the information from the board;
+                called with any additional arguments provided.
+        """
+
+        if key not in self._board_info:
+            self._board_info[key] = read_function(*args)
+
+        return self._board_info[key]
+
+
+    def board_id(self):
+        """ Reads the board ID number for the GreatFET device. """
+        return self._memoized_board_info('board_id', super(GreatFETBoard, self).board_id)
+
+
+    def firmware_version(self):
+        """ Reads the board's firmware version. """
+        return self._memoized_board_info('firmware_version', super(GreatFETBoard, self).firmware_version)
+
+
+    def part_id(self, as_hex_string=True):
+        """ Reads the board's part ID. """
+        return self._memoized_board_info(('part_id', as_hex_string),
+                super(GreatFETBoard, self).part_id, as_hex_string)
+
+
+    def serial_number(self, as_hex_string=True):
+        """ Reads the board's unique serial number. """
+        return self._memoized_board_info(('serial_number', as_hex_string),
+                super(GreatFETBoard, self).serial_number, as_hex_string)
+
+
+    def reset(self, reconnect=True, switch_to_external_clock=False,
+            is_post_firmware_flash=False, maintain_always_on_domain=False):
+        """ Resets the GreatFET device; see GreatBoard.reset.
+
+        Any memoized board information is discarded, as e.g. the firmware version
+        may change across a reset.
+        """
+        if reconnect:
+            identifiers = self._identifiers_for_reconnect(self._device_identifiers)
+
+            # If we don't know where the board lives on the bus, look it up before the reset;
+            # otherwise we'd have no way to tell the board apart from its pre-reset self.
+            if 'address' not in identifiers:
+                identifiers.update(self._current_usb_location(identifiers['serial_number']))
+
+        self._board_info.clear()
+        self._forget_enumerated_devices()
+        super(GreatFETBoard, self).reset(reconnect=False, switch_to_external_clock=switch_to_external_clock,
+                is_post_firmware_flash=is_post_firmware_flash, maintain_always_on_domain=maintain_always_on_domain)
+
+        if reconnect:
+            self._reconnect(identifiers)
+
+
+    def _identifiers_for_reconnect(self, identifiers):
+        """ Returns a copy of the given identifiers that will find this same board once it's
+        been reset, and is back at a new address. Must be called before the reset.
+
+        The board's serial number is added if it's not already present: otherwise, with more
+        than one board attached, we'd reconnect to whichever board happens to enumerate first.
+        """
+
+        identifiers = identifiers.copy()
+
+        if identifiers.get('serial_number') is None:
+            identifiers['serial_number'] = self.serial_number()
+
+        _pad_serial_number(identifiers)
+        return identifiers
+
+
+    def _current_usb_location(self, serial_number):
+        """ Finds the bus and address the board currently occupies, by its serial number.
+
+        Args:
+            serial_number -- The board's zero-padded serial number.
+
+        Returns a dictionary containing the board's bus and address, or an empty dictionary
+        if it couldn't be found.
+        """
+
+        identifiers = {
+            'idVendor': self.BOARD_VENDOR_ID,
+            'idProduct': self.BOARD_PRODUCT_ID,
+            'serial_number': serial_number,
+        }
+
+        try:
+            device = usb.core.find(backend=get_usb_backend(), **identifiers)
+        except usb.core.USBError:
+            device = None
+
+        if device is None:
+            return {}
+
+        location = {'bus': device.bus, 'address': device.address}
+        usb.util.dispose_resources(device)
+
+        return location
+
+
+    def _reconnect(self, identifiers):
+        """ Waits for the board to re-enumerate after a reset, and then reconnects to it.
+
+        Rather than waiting out the full RECONNECT_DELAY, we poll for the board with an
+        increasing backoff, and reconnect as soon as it's back.
+
+        Args:
+            identifiers -- The identifiers used to find the board before the reset, including
+                its serial number; see _identifiers_for_reconnect. If these
+                include the bus and address the board had, we'll wait for it to leave that
+                address, and then seek it anywhere: it'll have a new address once it's back.
+                Otherwise, we can't tell when the board has left, and so wait out the full
+                RECONNECT_DELAY before reconnecting.
+        """
+
+        identifiers = identifiers.copy()
+        bus = identifiers.pop('bus', None)
+        address = identifiers.pop('address', None)
+
+        if address is None:
+            time.sleep(self.RECONNECT_DELAY)
+            self._forget_enumerated_devices()
+            self.__init__(**identifiers)
+            self.initialize_apis()
+            return
+
+        deadline = time.monotonic() + self.RECONNECT_DELAY
+        poll_interval = RECONNECT_INITIAL_POLL_INTERVAL
+        last_error = DeviceNotFoundError()
+
+        while True:
+            time.sleep(poll_interval)
+
+            try:
+                # Until the board drops off the bus, it can still be found at its old address;
+                # make sure we don't reconnect to it there.
+                if usb.core.find(backend=get_usb_backend(), bus=bus, address=address) is None:
+                    self._forget_enumerated_devices()
+                    self.__init__(**identifiers)
+                    self.initialize_apis()
+                    return
+            except (DeviceNotFoundError, errors.DeviceNotFoundError) as e:
+                last_error = e
+            except usb.core.USBError as e:
+                if e.errno not in RECONNECT_TRANSIENT_ERRNOS:
+                    raise
+                last_error = e
+
+            # If the board never came back, report the last reason we couldn't reach it;
+            # e.g. so a persistent permissions error isn't reported as a missing board.
+            if time.monotonic() >= deadline:
+                raise last_error
+
+            poll_interval = min(poll_interval * 1.5, RECONNECT_MAX_POLL_INTERVAL)
+
+
     # FIXME: should these peripherals be in libgreat?
 
     def _populate_leds(self, led_count):
@@ -48,9 +537,9 @@ class GreatFETBoard(GreatBoard):
         Args:
             led_count -- The number of LEDS present on the board.
         """
-        self.leds = {}
-        for i in range(1, led_count + 1):
-            self.leds[i] = LED(self, i)
+
+        # Most programs touch only an LED or two, so only create LED objects as they're used.
+        self.leds = _LazyLEDMap(self, led_count)
 
 
     def _populate_gpio(self):
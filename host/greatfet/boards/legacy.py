@@ -5,7 +5,7 @@
 import array
 import struct
 
-from ..board import GreatFETBoard
+from ..board import GreatFETBoard, get_usb_backend
 from ..peripherals.firmware import DeviceFirmwareManager
 from ..errors import DeviceNotFoundError
 
@@ -32,6 +32,9 @@ class GreatFETLegacy(GreatFETBoard):
     # LibUSB constant for a stall / pipe error.
     LIBUSB_PIPE_ERROR = 32
 
+    # Layout of the response to a READ_PARTID_SERIALNO request.
+    PARTID_SERIALNO_FORMAT = struct.Struct("<8s16s")
+
     def version_warnings(self):
         """ Notify the user that their GreatFET requires an urgent upgrade.  """
         return "This device's firmware is too out of date! It must be upgraded before it can be used. " + \
@@ -44,6 +47,12 @@ class GreatFETLegacy(GreatFETBoard):
         """
         import usb
 
+        # Start off with no memoized board information; see _memoized_board_info.
+        self._board_info = {}
+
+        # Buffers we reuse for IN transfers, indexed by length; see _scratch_buffer.
+        self._scratch_buffers = {}
+
         # By default, accept any device with the default vendor/product IDs.
         self.identifiers = self.populate_default_identifiers(device_identifiers)
 
@@ -55,7 +64,7 @@ class GreatFETLegacy(GreatFETBoard):
 
         # Connect to the first available GreatFET device.
         try:
-            self.device = usb.core.find(**self.identifiers)
+            self.device = usb.core.find(backend=get_usb_backend(), **self.identifiers)
         except usb.core.USBError as e:
             # On some platforms, providing identifiers that don't match with any
             # real device produces a USBError/Pipe Error. We'll convert it into a
@@ -69,16 +78,33 @@ class GreatFETLegacy(GreatFETBoard):
         if self.device is None:
             raise DeviceNotFoundError()
 
-        # Ensure that we have an active USB connection to the device.
-        self.device.set_configuration()
+        try:
+            # Ensure that we have an active USB connection to the device.
+            self._ensure_configured()
 
-        # Final sanity check: if we don't handle this board ID, bail out!
-        if self.HANDLED_BOARD_IDS and (self.board_id() not in self.HANDLED_BOARD_IDS):
-            raise DeviceNotFoundError()
+            # Final sanity check: if we don't handle this board ID, bail out!
+            if self.HANDLED_BOARD_IDS and (self.board_id() not in self.HANDLED_BOARD_IDS):
+                raise DeviceNotFoundError()
 
-        # Final sanity check: if we don't handle this board ID, bail out!
-        if self.HANDLED_BOARD_IDS and (self.board_id() not in self.HANDLED_BOARD_IDS):
-            raise DeviceNotFoundError()
+        except BaseException:
+            # If we're not going to use this device, don't leave its handle open.
+            usb.util.dispose_resources(self.device)
+            raise
+
+
+    def _ensure_configured(self):
+        """ Places the device into its configuration, unless it's already configured. """
+        import usb
+
+        # Issuing a SET_CONFIGURATION costs a round trip, and spuriously fails on some
+        # platforms; so we only do so if the device isn't already configured.
+        try:
+            configuration = self.device.get_active_configuration()
+        except usb.core.USBError:
+            configuration = None
+
+        if configuration is None:
+            self.device.set_configuration()
 
 
     def initialize_apis(self):
@@ -107,8 +133,11 @@ class GreatFETLegacy(GreatFETBoard):
 
     def board_id(self):
         """Reads the board ID number for the GreatFET device."""
+        return self._memoized_board_info('board_id', self._read_board_id)
+
 
-        # Query the board for its ID number.
+    def _read_board_id(self):
+        """Queries the board for its ID number."""
         response = self.vendor_request_in(self.REQUEST_READ_BOARD_ID, length=1)
         return response[0]
 
@@ -122,15 +151,28 @@ class GreatFETLegacy(GreatFETBoard):
         """Reads the board's firmware version."""
 
         # Query the board for its firmware version, and convert that to a string.
-        return self.vendor_request_in_string(self.REQUEST_READ_VERSION_STRING, length=255)
+        return self._memoized_board_info('firmware_version', self.vendor_request_in_string,
+                self.REQUEST_READ_VERSION_STRING, 255)
+
+
+    def _read_part_id_and_serial_number(self):
+        """Returns a 2-tuple of (part_id, serial_number) byte strings. Both are read from
+        a single READ_PARTID_SERIALNO request, as the device provides them together."""
+        return self._memoized_board_info('part_id_and_serial_number', self._query_part_id_and_serial_number)
+
+
+    def _query_part_id_and_serial_number(self):
+        """Queries the board for its part ID and serial number."""
+        response = self.vendor_request_in(self.REQUEST_READ_PARTID_SERIALNO, length=24)
+
+        # The part ID constitutes the first eight bytes of the response, and the serial
+        # number the following sixteen.
+        return self.PARTID_SERIALNO_FORMAT.unpack_from(response)
 
 
     def serial_number(self, as_hex_string=True):
         """Reads the board's unique serial number."""
-        result = self.vendor_request_in(self.REQUEST_READ_PARTID_SERIALNO, length=24)
-
-        # The serial number starts eight bytes in.
-        result = result[8:]
+        _, result = self._read_part_id_and_serial_number()
 
         # If we've been asked to convert this to a hex string, do so.
         if as_hex_string:
@@ -145,11 +187,9 @@ class GreatFETLegacy(GreatFETBoard):
 
 
     def part_id(self, as_hex_string=True):
-        """Reads the board's unique serial number."""
-        result = self.vendor_request_in(self.REQUEST_READ_PARTID_SERIALNO, length=24)
+        """Reads the board's part ID."""
+        result, _ = self._read_part_id_and_serial_number()
 
-        # The part ID constitues the first eight bytes of the response.
-        result = result[0:7]
         if as_hex_string:
             result = _to_hex_string(result)
 
@@ -167,10 +207,19 @@ class GreatFETLegacy(GreatFETBoard):
         """
 
         import usb
-        import time
 
         type = 1 if switch_to_external_clock else 0
 
+        # Note how to find this board again before we reset it, while we can still ask it.
+        if reconnect:
+            identifiers = self._identifiers_for_reconnect(self.identifiers)
+            identifiers.update(bus=self.device.bus, address=self.device.address)
+
+        # Our memoized board information may not survive the reset; discard it,
+        # along with anything we know about where the board lives on the bus.
+        self._board_info.clear()
+        self._forget_enumerated_devices()
+
         try:
             self.vendor_request_out(self.REQUEST_RESET, value=type)
         except usb.core.USBError:
@@ -178,8 +227,7 @@ class GreatFETLegacy(GreatFETBoard):
 
         # If we're to attempt a reconnect, do so.
         if reconnect:
-            time.sleep(self.RECONNECT_DELAY)
-            self.__init__(**self.identifiers)
+            self._reconnect(identifiers)
 
             # FIXME: issue a reset to all device peripherals with state, here?
 
@@ -215,12 +263,36 @@ class GreatFETLegacy(GreatFETBoard):
             length_or_data -- The length of the data expected in response from the request.
         For OUT requests:
             length_or_data -- The data to be sent to the device.
+
+        Returns the response data as bytes for IN requests; or the number of
+        bytes sent for OUT requests.
         """
         import usb
 
-        return self.device.ctrl_transfer(
-            direction | usb.TYPE_VENDOR | usb.RECIP_DEVICE,
-            request, value, index, length_or_data, timeout)
+        request_type = direction | usb.TYPE_VENDOR | usb.RECIP_DEVICE
+
+        # For IN requests, have pyusb fill a reusable buffer rather than allocating
+        # a fresh one for each transfer; then hand our caller its own copy, as bytes,
+        # so it can slice, decode, and hex-format the data without per-byte work.
+        if direction == usb.ENDPOINT_IN:
+            buffer = self._scratch_buffer(length_or_data)
+            length = self.device.ctrl_transfer(request_type, request, value, index, buffer, timeout)
+            return bytes(memoryview(buffer)[:length])
+
+        return self.device.ctrl_transfer(request_type, request, value, index, length_or_data, timeout)
+
+
+    def _scratch_buffer(self, length):
+        """Returns a reusable buffer of the given length for receiving control transfers.
+
+        The buffer is only valid until the next transfer of the same length; callers
+        must copy out any data they want to keep.
+        """
+
+        if length not in self._scratch_buffers:
+            self._scratch_buffers[length] = array.array('B', [0]) * length
+
+        return self._scratch_buffers[length]
 
 
     def vendor_request_in(self, request, length, value=0, index=0, timeout=1000):
@@ -238,18 +310,20 @@ class GreatFETLegacy(GreatFETBoard):
 
     def vendor_request_in_string(self, request, length=255, value=0, index=0, timeout=1000,
             encoding='utf-8'):
-        import usb
-
         """Performs a USB control request that expects a respnose from the GreatFET.
-        Interprets the result as an encoded string.
+        Interprets the result as an encoded string, which ends at the first NUL, if any.
         Args:
             request -- The number of the vendor request to be performed. Usually
                 a constant from the protocol.vendor_requests module.
             length -- The length of the data expected in response from the request.
         """
+        import usb
+
         raw = self._vendor_request(usb.ENDPOINT_IN, request, length_or_data=length,
             value=value, index=index, timeout=timeout)
-        return raw.tostring().decode(encoding)
+
+        # The firmware provides C strings; don't decode anything past the terminator.
+        return raw.split(b'\x00', 1)[0].decode(encoding)
 
 
     def vendor_request_out(self, request, value=0, index=0, data=None, timeout=1000):
@@ -279,9 +353,7 @@ class GreatFETLegacy(GreatFETBoard):
 
 def _to_hex_string(byte_array):
     """Convert a byte array to a hex string."""
-
-    hex_generator = ('{:02x}'.format(x) for x in byte_array)
-    return ''.join(hex_generator)
+    return bytes(byte_array).hex()
 
 
 class LegacyFirmwareAdapter(object):
@@ -4,6 +4,7 @@
 
 from __future__ import print_function
 
+import array
 import time
 
 from greatfet.protocol import vendor_requests
@@ -31,12 +32,20 @@ def main():
     time.sleep(1)
     print(device.comms.device)
 
+    # Read into a single reusable buffer, rather than having pyusb allocate a new one for each read.
+    buffer = array.array('B', [0]) * 0x4000
+    view = memoryview(buffer)
+
     with open(args.filename, 'wb') as f:
+
+        # Look up our read and write functions once, rather than on every pass through the loop.
+        read = device.comms.device.read
+        write = f.write
+
         try:
             while True:
-                d = device.comms.device.read(0x81, 0x4000, 1000)
-                # print(d)
-                f.write(d)
+                length = read(0x81, buffer, 1000)
+                write(view[:length])
         except KeyboardInterrupt:
             pass
 
@@ -5,13 +5,7 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-import argparse
-import errno
-import sys
-
-import greatfet
-from greatfet import GreatFET
-from greatfet.utils import log_silent, log_verbose, GreatFETArgumentParser
+from greatfet.utils import GreatFETArgumentParser
 
 
 def main():
@@ -5,17 +5,386 @@
 from __future__ import print_function
 
 import argparse
+import array
+import collections
 import errno
+import mmap
 import sys
 import time
 import os
+import queue
 import tempfile
+import threading
 from zipfile import ZipFile
 
+# fcntl is only available on POSIX systems; we only need it for O_DIRECT captures.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 import greatfet
 from greatfet import GreatFET
 from greatfet.utils import log_silent, log_verbose
 
+
+# The endpoint on which the GreatFET delivers captured samples.
+SAMPLE_ENDPOINT = 0x81
+
+# The default size of each bulk read of samples; and how long we'll wait for one to complete, in ms.
+# A single read can span many bulk packets, so we request plenty at once to keep our per-read
+# overhead low; at the analyzer's sample rate, this still fills in a few tens of milliseconds.
+TRANSFER_SIZE = 256 * 1024
+TRANSFER_TIMEOUT_MS = 1000
+
+# Transfer sizes must be a whole number of high-speed bulk packets.
+BULK_PACKET_SIZE = 512
+
+# On Linux, the limit on how much memory usbfs will let in-flight transfers use.
+USBFS_MEMORY_LIMIT_PATH = '/sys/module/usbcore/parameters/usbfs_memory_mb'
+
+# The real-time priority we'll request for the reader thread; and the niceness we'll
+# settle for, if we're not allowed real-time scheduling.
+READER_REALTIME_PRIORITY = 20
+READER_NICENESS = -10
+
+# How often the writer wakes while waiting for samples, in seconds. Blocking waits can't be
+# interrupted by Ctrl+C on every platform, so we don't block indefinitely.
+WRITER_POLL_INTERVAL = 0.05
+
+# The most buffers of samples we'll hand to the OS in a single write.
+MAX_WRITE_BATCH = 16
+
+# How much captured data can be waiting to be written before we warn the user that writes
+# aren't keeping up with the capture.
+WRITE_BACKLOG_WARNING_THRESHOLD = 64 * 1024 * 1024
+
+# The most captured data we'll hold in memory waiting to be written; once writes fall this far
+# behind, newly captured data is dropped until they catch up.
+WRITE_BACKLOG_LIMIT = 4 * WRITE_BACKLOG_WARNING_THRESHOLD
+
+
+class DirectCaptureFile(object):
+    """ A capture file written with O_DIRECT, so long captures bypass the page cache.
+
+    O_DIRECT writes must come from aligned memory and cover whole blocks; so we stage
+    samples in a page-aligned buffer, and write them out a full staging buffer at a time.
+    """
+
+    # How much data we stage before each write; a multiple of any reasonable block size.
+    STAGING_SIZE = 1024 * 1024
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_DIRECT, 0o644)
+
+        # Anonymous mappings are always page-aligned.
+        self.staging = mmap.mmap(-1, self.STAGING_SIZE)
+        self.staged = 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def write(self, data):
+        """ Adds the given data to the file. """
+
+        data = memoryview(data)
+
+        while data:
+            count = min(len(data), self.STAGING_SIZE - self.staged)
+            self.staging[self.staged:self.staged + count] = data[:count]
+            self.staged += count
+            data = data[count:]
+
+            if self.staged == self.STAGING_SIZE:
+                self._write_staged()
+
+
+    def _write_staged(self):
+        """ Writes out everything currently staged. """
+
+        with memoryview(self.staging) as staging:
+            remaining = staging[:self.staged]
+            while remaining:
+                remaining = remaining[os.write(self.fd, remaining):]
+
+        self.staged = 0
+
+
+    def close(self):
+        """ Writes out any remaining data, and closes the file. """
+
+        if self.fd is None:
+            return
+
+        try:
+            # Our final write is unlikely to be a whole number of blocks, so it can't be
+            # made with O_DIRECT; drop back to a normal write for it.
+            if self.staged:
+                flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+                fcntl.fcntl(self.fd, fcntl.F_SETFL, flags & ~os.O_DIRECT)
+                self._write_staged()
+        finally:
+            os.close(self.fd)
+            self.staging.close()
+            self.fd = None
+
+
+def open_capture_file(path, direct=False):
+    """ Opens the file that captured samples will be written into. """
+
+    if direct:
+        return DirectCaptureFile(path)
+
+    # Our writes are already large, so skip the buffering that would only add another copy.
+    return open(path, "wb", buffering=0)
+
+
+def allocate_transfer_buffer(transfer_size):
+    """ Allocates a buffer into which a single bulk read of samples can be placed. """
+    return array.array('B', [0]) * transfer_size
+
+
+def warn_if_usbfs_limit_too_small(transfer_size):
+    """ Warns the user if Linux's usbfs memory limit is too small for the requested transfers. """
+
+    try:
+        with open(USBFS_MEMORY_LIMIT_PATH) as f:
+            limit_mb = int(f.read())
+    except (OSError, ValueError):
+        return
+
+    # A limit of zero means usbfs isn't limited.
+    if limit_mb and (limit_mb * 1024 * 1024) < transfer_size:
+        print("warning: usbfs only allows {} MiB of in-flight transfers, which is less than the requested "
+              "transfer size; to raise the limit, run:\n"
+              "  sudo sh -c 'echo 1024 > {}'".format(limit_mb, USBFS_MEMORY_LIMIT_PATH), file=sys.stderr)
+
+
+def pin_current_thread(cpu):
+    """ Restricts the calling thread to running on the given CPU, where the OS allows it.
+
+    On Linux, affinity applies to the individual calling thread, not the whole process.
+    """
+
+    if not hasattr(os, 'sched_setaffinity'):
+        print("warning: can't pin threads to CPUs on this platform; ignoring", file=sys.stderr)
+        return
+
+    try:
+        os.sched_setaffinity(0, {cpu})
+    except (OSError, ValueError) as e:
+        print("warning: couldn't pin a capture thread to CPU {}: {}".format(cpu, e), file=sys.stderr)
+
+
+def elevate_current_thread_priority():
+    """ Attempts to raise the calling thread's scheduling priority, so it isn't preempted while
+    the device is waiting for us to read. Quietly does nothing if we're not permitted to.
+    """
+
+    # Try real-time scheduling first...
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(READER_REALTIME_PRIORITY))
+        return
+    except (AttributeError, OSError):
+        pass
+
+    # ... and if that's not allowed, settle for being nicer than everyone else.
+    try:
+        os.nice(READER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def read_samples(device, empty_buffers, full_buffers, termination_request, transfer_size=TRANSFER_SIZE, cpu=None,
+                 realtime=False):
+    """ Continuously reads samples from the device until asked to stop.
+
+    Intended to run in its own thread, so the next USB read is issued as soon as
+    the previous one completes, rather than after its samples have been written out.
+
+    Args:
+        device -- The GreatFET from which samples are to be read.
+        empty_buffers -- A pool of transfer buffers that are free to be read into; we'll
+            allocate more if this runs dry, up to WRITE_BACKLOG_LIMIT's worth of buffers.
+        full_buffers -- The queue that receives a (buffer, length) tuple for each read. Once
+            reading stops, this receives None -- or the exception that stopped the reads.
+        termination_request -- An event that's set when reading should stop.
+        transfer_size -- The size of each bulk read, in bytes.
+        cpu -- If provided, the CPU to which the reading thread should be pinned.
+        realtime -- If true, the reading thread will try to raise its scheduling priority.
+    """
+
+    # Falling behind on reads is what makes a capture overrun; so if asked, get as much of the CPU as we can.
+    # This is opt-in: a busy real-time reader can starve everything else on a small machine.
+    if realtime:
+        elevate_current_thread_priority()
+    if cpu is not None:
+        pin_current_thread(cpu)
+
+    # Look up everything we use on each read just once, since this loop runs for every transfer.
+    read = device.comms.device.read
+    stop_requested = termination_request.is_set
+    take_empty_buffer = empty_buffers.pop
+    hand_off = full_buffers.put
+    backlog_length = full_buffers.qsize
+
+    # When our writes fall behind, we let the backlog grow -- and make sure the user knows that's
+    # happening -- but only so far: past WRITE_BACKLOG_LIMIT, we drop data rather than run out of memory.
+    backlog_warning_length = max(WRITE_BACKLOG_WARNING_THRESHOLD // transfer_size, 1)
+    max_buffers = max(WRITE_BACKLOG_LIMIT // transfer_size, 2)
+    warned_about_backlog = False
+
+    # Data we're dropping still has to be read, so the device doesn't overrun; it's read into here.
+    buffers_allocated = 0
+    discard_buffer = None
+    transfers_dropped = 0
+    total_transfers_dropped = 0
+
+    try:
+        while not stop_requested():
+            if empty_buffers:
+                transfer_buffer = take_empty_buffer()
+            elif buffers_allocated < max_buffers:
+                transfer_buffer = allocate_transfer_buffer(transfer_size)
+                buffers_allocated += 1
+            else:
+                transfer_buffer = None
+
+            # If we've no buffer to spare, our writes are too far behind to keep this data.
+            if transfer_buffer is None:
+                if discard_buffer is None:
+                    discard_buffer = allocate_transfer_buffer(transfer_size)
+                if not transfers_dropped:
+                    print("warning: backpressure -- writes have fallen {} MiB behind the capture; "
+                          "dropping captured data".format(WRITE_BACKLOG_LIMIT // (1024 * 1024)), file=sys.stderr)
+
+                read(SAMPLE_ENDPOINT, discard_buffer, TRANSFER_TIMEOUT_MS)
+                transfers_dropped += 1
+                continue
+
+            if transfers_dropped:
+                print("warning: dropped {} transfers of captured data".format(transfers_dropped), file=sys.stderr)
+                total_transfers_dropped += transfers_dropped
+                transfers_dropped = 0
+
+            # Read directly into our buffer, rather than having pyusb allocate a new one for each read.
+            length = read(SAMPLE_ENDPOINT, transfer_buffer, TRANSFER_TIMEOUT_MS)
+            hand_off((transfer_buffer, length,))
+
+            if not warned_about_backlog and backlog_length() >= backlog_warning_length:
+                print("warning: captured data is arriving faster than it can be written; "
+                      "buffering it in memory", file=sys.stderr)
+                warned_about_backlog = True
+    except Exception as e:
+        full_buffers.put(e)
+    else:
+        full_buffers.put(None)
+    finally:
+        total_transfers_dropped += transfers_dropped
+        if total_transfers_dropped:
+            print("warning: {} transfers of captured data were dropped in total; the capture has gaps".format(
+                  total_transfers_dropped), file=sys.stderr)
+
+
+def write_buffers(bin_file, views):
+    """ Writes each of the given buffers to the file, in order -- with a single writev() where possible. """
+
+    # Files that stage their own writes (e.g. for O_DIRECT) don't expose a descriptor to write to.
+    if not hasattr(os, 'writev') or not hasattr(bin_file, 'fileno'):
+        for view in views:
+            bin_file.write(view)
+        return
+
+    fd = bin_file.fileno()
+
+    while views:
+        written = os.writev(fd, views)
+
+        # If the write came up short, drop whatever was written completely, and resume
+        # from wherever we left off.
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if views:
+            views[0] = views[0][written:]
+
+
+def drop_from_page_cache(bin_file, offset, length):
+    """ Asks the OS to evict a written region of the file from its page cache.
+
+    Captures are written once and not re-read; so there's no sense in letting a long
+    capture crowd everything else out of memory.
+
+    Pages that are still dirty can't be evicted yet: the advice only starts their writeback.
+    Callers should re-advise regions they've already advised, once that writeback has had
+    time to finish.
+    """
+
+    # Files that manage their own writes (e.g. for O_DIRECT) already bypass the page cache.
+    if not hasattr(os, 'posix_fadvise') or not hasattr(bin_file, 'fileno'):
+        return
+
+    os.posix_fadvise(bin_file.fileno(), offset, length, os.POSIX_FADV_DONTNEED)
+
+
+def write_samples(bin_file, empty_buffers, full_buffers):
+    """ Writes each buffer of samples produced by read_samples to the given file,
+    until the reads stop; returning each buffer to the pool once it's been written.
+
+    Raises any exception that stopped the reads.
+    """
+
+    # Keep track of where we are in the file, so what we've written can be dropped from the page cache.
+    # We may be resuming a capture that's already partially written, so start from the current position.
+    offset = bin_file.tell() if hasattr(bin_file, 'fileno') else 0
+    previous_batch_start = offset
+
+    # Look up the queue operations we use on each pass just once, as we do when reading.
+    wait_for_samples = full_buffers.get
+    take_waiting_samples = full_buffers.get_nowait
+
+    while True:
+        try:
+            samples = [wait_for_samples(timeout=WRITER_POLL_INTERVAL)]
+        except queue.Empty:
+            continue
+
+        # Grab any other buffers that are already waiting, so they can all be written at once.
+        while len(samples) < MAX_WRITE_BATCH and isinstance(samples[-1], tuple):
+            try:
+                samples.append(take_waiting_samples())
+            except queue.Empty:
+                break
+
+        # If the reads stopped, set aside how they stopped until we've written what came before.
+        reads_stopped = not isinstance(samples[-1], tuple)
+        if reads_stopped:
+            stop_reason = samples.pop()
+
+        # Write straight from the transfer buffers, without copying them into bytes objects first.
+        write_buffers(bin_file, [memoryview(transfer_buffer)[:length] for transfer_buffer, length in samples])
+        empty_buffers.extend(transfer_buffer for transfer_buffer, _ in samples)
+
+        # Advise the previous batch along with this one: the batch we just wrote is still dirty, and
+        # will only be evicted once it's been written back and is advised again. Re-advising just that
+        # trailing window keeps the cost of each batch independent of how much we've captured.
+        batch_start = offset
+        offset += sum(length for _, length in samples)
+        drop_from_page_cache(bin_file, previous_batch_start, offset - previous_batch_start)
+        previous_batch_start = batch_start
+
+        if reads_stopped:
+            if isinstance(stop_reason, Exception):
+                raise stop_reason
+            return
+
+
 def main():
     # Set up a simple argument parser.
     parser = argparse.ArgumentParser(description="Logic analyzer implementation for GreatFET")
@@ -25,9 +394,26 @@ def main():
                         help="Generate a binary file contianing the captured data.")
     parser.add_argument('-p', '--pulseview', dest='pulseview', metavar="<filename>", type=str,
                         help="Generate a PulseView session file.")
+    parser.add_argument('--transfer-size', dest='transfer_size', metavar='<bytes>', type=int, default=TRANSFER_SIZE,
+                        help="The size of each USB read; larger reads mean less per-transfer overhead. (default: %(default)s)")
+    parser.add_argument('--o-direct', dest='direct', action='store_true',
+                        help="Write captured data with O_DIRECT, bypassing the page cache on long captures. (Linux only)")
+    parser.add_argument('--reader-cpu', dest='reader_cpu', metavar='<cpu>', type=int, default=None,
+                        help="Pin the thread that reads from the device to the given CPU.")
+    parser.add_argument('--writer-cpu', dest='writer_cpu', metavar='<cpu>', type=int, default=None,
+                        help="Pin the thread that writes captured data to the given CPU.")
+    parser.add_argument('--realtime', dest='realtime', action='store_true',
+                        help="Try to give the thread that reads from the device real-time priority, where permitted.")
     parser.add_argument('-v', dest='verbose', action='store_true', help="Write data from file")
     args = parser.parse_args()
 
+    if args.direct and not hasattr(os, 'O_DIRECT'):
+        parser.error("--o-direct isn't supported on this platform")
+    if args.transfer_size <= 0 or args.transfer_size % BULK_PACKET_SIZE:
+        parser.error("--transfer-size must be a positive multiple of {} bytes".format(BULK_PACKET_SIZE))
+
+    warn_if_usbfs_limit_too_small(args.transfer_size)
+
     capture_data_name='logic-1'
 
     log_function = log_verbose if args.verbose else log_silent
@@ -61,38 +447,57 @@ def main():
 
     print("Press Ctrl+C to stop reading data from device")
     try:
-        with open(bin_file_name, "wb") as bin_file:
+        with open_capture_file(bin_file_name, args.direct) as bin_file:
+
+            # Read samples in the background, so the USB reads continue while we write.
+            empty_buffers = collections.deque()
+            full_buffers = queue.SimpleQueue()
+            termination_request = threading.Event()
+            reader = threading.Thread(target=read_samples,
+                                      args=(device, empty_buffers, full_buffers, termination_request,
+                                            args.transfer_size, args.reader_cpu, args.realtime))
+            reader.start()
+
+            # Pin ourselves only once the reader's started, so it doesn't inherit our affinity.
+            if args.writer_cpu is not None:
+                pin_current_thread(args.writer_cpu)
+
             try:
-                while True:
-                    d = device.comms.device.read(0x81, 16384, 1000)
-                    bin_file.write(d)
+                write_samples(bin_file, empty_buffers, full_buffers)
             except KeyboardInterrupt:
                 print()
 
-            if args.binary:
-                print("Binary data written to file '%s'" % args.binary)
-
-            if args.pulseview:
-                metadata_str = "[device 1]\n" \
-                    "capturefile={}\n" \
-                    "total probes=8\n" \
-                    "samplerate=17 MHz\n" \
-                    "total analog=0\n" \
-                    "probe1=SGPIO0\n" \
-                    "probe2=SGPIO1\n" \
-                    "probe3=SGPIO2\n" \
-                    "probe4=SGPIO3\n" \
-                    "probe5=SGPIO4\n" \
-                    "probe6=SGPIO5\n" \
-                    "probe7=SGPIO6\n" \
-                    "probe8=SGPIO7\n" \
-                    "unitsize=1\n".format(capture_data_name)
-                # pulseview compatible .sr archive
-                with ZipFile(sr_name, "w") as zip:
-                    zip.write(bin_file_name, arcname='logic-1')
-                    zip.writestr("metadata", metadata_str)
-                    zip.writestr("version", "2")
-                print("Pulseview compatible session file created: '%s'" % sr_name)
+                # Stop reading, and write out anything read before the reads stopped.
+                termination_request.set()
+                write_samples(bin_file, empty_buffers, full_buffers)
+            finally:
+                termination_request.set()
+                reader.join()
+
+        if args.binary:
+            print("Binary data written to file '%s'" % args.binary)
+
+        if args.pulseview:
+            metadata_str = "[device 1]\n" \
+                "capturefile={}\n" \
+                "total probes=8\n" \
+                "samplerate=17 MHz\n" \
+                "total analog=0\n" \
+                "probe1=SGPIO0\n" \
+                "probe2=SGPIO1\n" \
+                "probe3=SGPIO2\n" \
+                "probe4=SGPIO3\n" \
+                "probe5=SGPIO4\n" \
+                "probe6=SGPIO5\n" \
+                "probe7=SGPIO6\n" \
+                "probe8=SGPIO7\n" \
+                "unitsize=1\n".format(capture_data_name)
+            # pulseview compatible .sr archive
+            with ZipFile(sr_name, "w") as zip:
+                zip.write(bin_file_name, arcname='logic-1')
+                zip.writestr("metadata", metadata_str)
+                zip.writestr("version", "2")
+            print("Pulseview compatible session file created: '%s'" % sr_name)
     finally:
         try:
             os.remove(path)
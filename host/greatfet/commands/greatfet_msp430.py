@@ -4,7 +4,6 @@
 
 from __future__ import print_function
 
-import argparse
 import errno
 import sys
 import ast
@@ -5,6 +5,7 @@
 from __future__ import print_function
 
 import argparse
+import array
 import errno
 import sys
 import time
@@ -46,12 +47,20 @@ def main():
     if args.receive:
         device.comms._vendor_request_out(vendor_requests.SDIR_RX_START)
         time.sleep(1)
+        # Read into a single reusable buffer, rather than having pyusb allocate a new one for each read.
+        buffer = array.array('B', [0]) * 0x4000
+        view = memoryview(buffer)
+
         with open(args.filename, 'wb') as f:
+
+            # Look up our read and write functions once, rather than on every pass through the loop.
+            read = device.comms.device.read
+            write = f.write
+
             try:
                 while True:
-                    d = device.comms.device.read(0x81, 0x4000, 1000)
-                    # print(d)
-                    f.write(d)
+                    length = read(0x81, buffer, 1000)
+                    write(view[:length])
             except KeyboardInterrupt:
                 pass
         device.comms._vendor_request_out(vendor_requests.SDIR_RX_STOP)
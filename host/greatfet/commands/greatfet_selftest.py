@@ -6,10 +6,8 @@
 Self-testing framework for GreatFET hardware.
 """
 
-import math
 import unittest
 
-from greatfet import GreatFET
 from greatfet.utils import GreatFETArgumentParser
 
 
@@ -9,6 +9,8 @@ import errno
 import sys
 import re
 
+# Code passed with --exec is evaluated in this module's namespace; keep the names
+# it's commonly written against available to it.
 from greatfet import GreatFET
 from greatfet.utils import GreatFETArgumentParser
 
@@ -6,7 +6,7 @@ from __future__ import absolute_import
 
 import usb
 import time
-import codecs
+import struct
 
 from .base import GlitchKitModule
 from ..protocol import vendor_requests
@@ -17,6 +17,9 @@ from ..protocol import vendor_requests
 LIBUSB_TIMEOUT = 60
 LIBUSB_IO_ERROR = 5
 
+# Layout of a USB setup packet: request_type, request, value, index, and length.
+SETUP_PACKET = struct.Struct('<BBHHH')
+
 
 class GlitchKitUSB(GlitchKitModule):
     """
@@ -79,15 +82,6 @@ class GlitchKitUSB(GlitchKitModule):
         self.api.configure_requests(continue_despite_errors, disable_vbus_afterwards)
 
 
-    @staticmethod
-    def _split(value):
-        # TODO: get rid of this
-
-        value_high  = value >> 8
-        value_low = value & 0xFF
-        return [value_low, value_high]
-
-
     @staticmethod
     def build_request_type(is_in, type, recipient):
 
@@ -110,18 +104,14 @@ class GlitchKitUSB(GlitchKitModule):
         #       uint16_t index;
         #       uint16_t length;
 
-        # TODO: replace me with a call to struct.pack?
-        setup_request = [self.build_request_type(is_in, request_type, recipient), request]
-        setup_request.extend(self._split(value))
-        setup_request.extend(self._split(index))
-        setup_request.extend(self._split(length))
-        return setup_request
+        request_type = self.build_request_type(is_in, request_type, recipient)
+        return SETUP_PACKET.pack(request_type, request, value, index, length)
 
 
     def capture_control_in(self, request_type=0, recipient=0, request=0, value=0, index=0, length=0, timeout=30, ui_event_call=False):
 
         # Build a setup packet...
-        setup_packet = bytes(self.build_setup_request(True, request_type, recipient, request, value, index, length))
+        setup_packet = self.build_setup_request(True, request_type, recipient, request, value, index, length)
 
         # ... and issue the request.
         return self.api.control_in(setup_packet, timeout=timeout * 1024)
@@ -32,7 +32,10 @@ class GPIO(GreatFETPeripheral):
         self.api = self.board.apis.gpio
         self.pin_mappings = {}
 
+        # The names of the pins that are free for use, in the order they were registered; we also
+        # keep them in a set, so checking whether a pin is free doesn't need a linear search.
         self.available_pins = []
+        self._available_pin_names = set()
         self.active_gpio = {}
 
         # For convenience:
@@ -68,7 +71,11 @@ class GPIO(GreatFETPeripheral):
         if name not in self.pin_mappings:
             raise ValueError("Unknown GPIO pin {}".format(name))
 
+        if name not in self._available_pin_names:
+            raise ValueError("GPIO pin {} is already in use".format(name))
+
         self.available_pins.remove(name)
+        self._available_pin_names.remove(name)
 
 
     def mark_pin_as_unused(self, name):
@@ -77,8 +84,9 @@ class GPIO(GreatFETPeripheral):
         if name not in self.pin_mappings:
             raise ValueError("Unknown GPIO pin {}".format(name))
 
-        if name not in self.available_pins:
+        if name not in self._available_pin_names:
             self.available_pins.append(name)
+            self._available_pin_names.add(name)
 
 
     def get_available_pins(self, include_active=True):
@@ -104,7 +112,7 @@ class GPIO(GreatFETPeripheral):
             return self.active_gpio[name]
 
         # If the pin's available for GPIO use, grab it.
-        if name in self.available_pins:
+        if name in self._available_pin_names:
             port = self.pin_mappings[name]
 
             self.active_gpio[name] = GPIOPin(self, name, port)
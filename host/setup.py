@@ -1,5 +1,4 @@
 import os
-import sys
 from setuptools import setup, find_packages
 
 def read(fname):
@@ -8,14 +7,6 @@ def read(fname):
         return f.read()
 
 
-# Handle python2 vs python3 requirements.
-per_version_requirements = []
-if sys.version_info < (3, 0):
-    per_version_requirements.append('ipython<6')
-else:
-    per_version_requirements.append('ipython')
-
-
 setup_req = []
 setup_options = {}
 
@@ -58,11 +49,11 @@ setup(
     author='Great Scott Gadgets',
     author_email='ktemkin@greatscottgadgets.com',
     tests_require=[''],
+    python_requires='>=3.7',
     install_requires= [
-        per_version_requirements,
+        'ipython',
         'pyusb',
         'pygreat',
-        'future'
     ],
     description='Python library for hardware hacking with the GreatFET',
     long_description=read('README.md'),
@@ -71,6 +62,8 @@ setup(
     platforms='any',
     classifiers = [
         'Programming Language :: Python',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
         'Development Status :: 1 - Planning',
         'Natural Language :: English',
         'Environment :: Console',